@@ -1,15 +1,9 @@
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
                              QTabWidget, QTreeWidget, QTreeWidgetItem, QComboBox, QTextEdit, QLineEdit, QFileDialog, 
-                             QMessageBox, QCalendarWidget, QSplitter, QProgressDialog, QDialog, QListWidget)
-from PyQt5.QtGui import QFont, QColor, QPalette, QPixmap
-from PyQt5.QtCore import Qt, QDate, QUrl
+                             QMessageBox, QCalendarWidget, QSplitter, QDialog, QListWidget)
+from PyQt5.QtGui import QFont, QColor, QPalette, QPixmap, QTextCharFormat
+from PyQt5.QtCore import Qt, QDate, QUrl, QThread, pyqtSignal
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-import sqlite3
-from datetime import datetime
-import requests
-import base64
-import folium
-from folium.plugins import HeatMap
 import io
 import os
 from PIL import Image
@@ -17,10 +11,36 @@ import tempfile
 import json
 import webbrowser
 
-# Constants for the API
-GEMINI_API_KEY = ''
-GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent'
-GEMINI_VISION_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent'
+from community_safety_service import ASSESSMENT_ERROR_PREFIX, CommunitySafetyService, DEFAULT_DB_PATH
+
+# Backlog reports sent to Gemini per background run, after the reports just submitted.
+ASSESSMENT_BATCH_SIZE = 5
+# How long closing the window waits for an in-flight assessment before giving up on it.
+ASSESSMENT_SHUTDOWN_WAIT_MS = 3000
+
+class AssessmentQueueWorker(QThread):
+    report_assessed = pyqtSignal(int, str)
+
+    def __init__(self, db_path, report_ids, backlog_limit, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.report_ids = report_ids
+        self.backlog_limit = backlog_limit
+        self.stop_requested = False
+
+    def request_stop(self):
+        self.stop_requested = True
+
+    def run(self):
+        # SQLite connections can't be shared across threads, so the worker opens its own.
+        service = CommunitySafetyService(self.db_path, None)
+        should_stop = lambda: self.stop_requested
+        try:
+            # Reports submitted in this session come first; the priority queue fills the rest of the run.
+            service.assess_reports(self.report_ids, self.report_assessed.emit, should_stop)
+            service.process_assessment_queue(self.backlog_limit, self.report_assessed.emit, should_stop)
+        finally:
+            service.close()
 
 class CommunitySafetyApp(QMainWindow):
     def __init__(self):
@@ -31,8 +51,10 @@ class CommunitySafetyApp(QMainWindow):
 
         self.apply_theme()
 
-        self.conn = sqlite3.connect('community_safety.db')
-        self.create_tables()
+        self.service = CommunitySafetyService(DEFAULT_DB_PATH)
+        self.assessment_worker = None
+        self.assessment_rerun = False
+        self.awaiting_assessment = set()
 
         self.main_widget = QWidget()
         self.setCentralWidget(self.main_widget)
@@ -97,69 +119,6 @@ class CommunitySafetyApp(QMainWindow):
             }
         """)
 
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        
-        # Drop the table if it exists (Optional: Only if you're okay with losing existing data)
-        # cursor.execute('DROP TABLE IF EXISTS reports')
-
-        # Recreate the table with the new schema
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY,
-                type TEXT,
-                description TEXT,
-                location TEXT,
-                timestamp TEXT,
-                status TEXT,
-                media_path TEXT,
-                assessment TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY,
-                title TEXT,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                organizer TEXT
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS feedback (
-                id INTEGER PRIMARY KEY,
-                category TEXT,
-                message TEXT,
-                timestamp TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sos (
-                id INTEGER PRIMARY KEY,
-                emergency_type TEXT,
-                location TEXT,
-                contact TEXT,
-                timestamp TEXT
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS forum_posts (
-                id INTEGER PRIMARY KEY,
-                title TEXT,
-                content TEXT,
-                author TEXT,
-                timestamp TEXT
-            )
-        ''')
-        
-        self.conn.commit()
-
-
     def create_dashboard_tab(self):
         dashboard_tab = QWidget()
         dashboard_layout = QVBoxLayout(dashboard_tab)
@@ -169,7 +128,7 @@ class CommunitySafetyApp(QMainWindow):
         dashboard_layout.addWidget(weather_label)
 
         self.reports_tree = QTreeWidget()
-        self.reports_tree.setHeaderLabels(["Type", "Location", "Status"])
+        self.reports_tree.setHeaderLabels(["Type", "Location", "Status", "Severity"])
         dashboard_layout.addWidget(self.reports_tree)
 
         self.refresh_reports()
@@ -220,8 +179,13 @@ class CommunitySafetyApp(QMainWindow):
         label.setFont(QFont("Arial", 20, QFont.Bold))
         events_layout.addWidget(label)
 
+        self.events_calendar = QCalendarWidget()
+        self.events_calendar.currentPageChanged.connect(
+            lambda year, month: self.highlight_busy_days(self.events_calendar, year, month))
+        events_layout.addWidget(self.events_calendar)
+
         self.events_tree = QTreeWidget()
-        self.events_tree.setHeaderLabels(["Title", "Date", "Location"])
+        self.events_tree.setHeaderLabels(["Title", "Date", "Location", "Repeats"])
         events_layout.addWidget(self.events_tree)
 
         add_event_button = QPushButton("Add Event")
@@ -232,6 +196,8 @@ class CommunitySafetyApp(QMainWindow):
         refresh_events_button.clicked.connect(self.refresh_events)
         events_layout.addWidget(refresh_events_button)
 
+        self.refresh_events()
+
         self.tabs.addTab(events_tab, "Community Events")
 
     def create_resources_tab(self):
@@ -377,25 +343,7 @@ class CommunitySafetyApp(QMainWindow):
         self.chat_display.append(message)
 
     def get_ai_response(self, user_message):
-        try:
-            headers = {
-                'Content-Type': 'application/json',
-            }
-            data = {
-                'contents': [{'parts': [{'text': user_message}]}],
-            }
-            params = {
-                'key': GEMINI_API_KEY,
-            }
-            response = requests.post(GEMINI_API_URL, headers=headers, json=data, params=params)
-            
-            if response.status_code == 200:
-                ai_response = response.json()['candidates'][0]['content']['parts'][0]['text']
-                self.display_message("AI Assistant: " + ai_response)
-            else:
-                self.display_message(f"AI Assistant: Error - Status Code {response.status_code}")
-        except Exception as e:
-            self.display_message(f"AI Assistant: An error occurred: {str(e)}")
+        self.display_message("AI Assistant: " + self.service.ask_assistant(user_message))
 
     def upload_media(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Upload Image", "", "Image Files (*.png *.jpg *.jpeg)")
@@ -413,7 +361,6 @@ class CommunitySafetyApp(QMainWindow):
         concern = self.concern_type.currentText()
         desc = self.description.toPlainText().strip()
         loc = self.location.text().strip()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         if not concern or not desc or not loc:
             QMessageBox.critical(self, "Error", "Please fill in all fields")
@@ -421,76 +368,54 @@ class CommunitySafetyApp(QMainWindow):
 
         media_path = getattr(self, 'media_path', None)
 
-        progress_dialog = QProgressDialog("Analyzing report...", None, 0, 100, self)
-        progress_dialog.setWindowModality(Qt.WindowModal)
-        progress_dialog.show()
+        # Stored straight away with the local triage result; the remote assessment
+        # runs in the background.
+        report_id, triage = self.service.add_report(concern, desc, loc, media_path)
+        self.awaiting_assessment.add(report_id)
+        self.start_assessment_queue()
 
-        assessment = self.get_incident_assessment(concern, desc, loc, media_path, progress_dialog)
-
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO reports (type, description, location, timestamp, status, media_path, assessment) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                       (concern, desc, loc, timestamp, "Pending", media_path, assessment))
-        self.conn.commit()
-
-        progress_dialog.close()
-
-        QMessageBox.information(self, "Success", "Report submitted successfully\n\nIncident Assessment:\n" + assessment)
         self.clear_report_fields()
         self.refresh_reports()
 
-    def get_incident_assessment(self, concern, desc, loc, media_path, progress_dialog):
-        prompt = f"Analyze the following incident report:\nType: {concern}\nDescription: {desc}\nLocation: {loc}\n\nProvide a detailed assessment including:\n1. Severity level\n2. Potential risks\n3. Recommended actions\n4. Additional resources needed (if any)"
-        
-        progress_dialog.setValue(25)
-
-        if media_path:
-            with open(media_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            headers = {
-                'Content-Type': 'application/json',
-            }
-            data = {
-                'contents': [
-                    {
-                        'parts': [
-                            {'text': prompt},
-                            {
-                                'inline_data': {
-                                    'mime_type': 'image/jpeg',
-                                    'data': image_data
-                                }
-                            }
-                        ]
-                    }
-                ],
-            }
-            params = {
-                'key': GEMINI_API_KEY,
-            }
-            response = requests.post(GEMINI_VISION_API_URL, headers=headers, json=data, params=params)
-        else:
-            headers = {
-                'Content-Type': 'application/json',
-            }
-            data = {
-                'contents': [{'parts': [{'text': prompt}]}],
-            }
-            params = {
-                'key': GEMINI_API_KEY,
-            }
-            response = requests.post(GEMINI_API_URL, headers=headers, json=data, params=params)
+        QMessageBox.information(self, "Success", "Report submitted successfully\n\n"
+                                f"Triage: {triage.severity} severity, {triage.category}\n\n"
+                                "The full incident assessment will follow once it is ready.")
 
-        progress_dialog.setValue(75)
+    def start_assessment_queue(self):
+        if self.assessment_worker and self.assessment_worker.isRunning():
+            self.assessment_rerun = True
+            return
 
-        if response.status_code == 200:
-            assessment = response.json()['candidates'][0]['content']['parts'][0]['text']
-        else:
-            assessment = f"Error in getting assessment: Status Code {response.status_code}"
+        self.assessment_worker = AssessmentQueueWorker(self.service.db_path, sorted(self.awaiting_assessment),
+                                                       ASSESSMENT_BATCH_SIZE, self)
+        self.assessment_worker.report_assessed.connect(self.show_assessment)
+        self.assessment_worker.finished.connect(self.assessment_queue_finished)
+        self.assessment_worker.start()
 
-        progress_dialog.setValue(100)
+    def assessment_queue_finished(self):
+        if self.assessment_rerun:
+            self.assessment_rerun = False
+            self.start_assessment_queue()
 
-        return assessment
+    def show_assessment(self, report_id, assessment):
+        # Only reports submitted in this session get a pop-up.
+        if report_id not in self.awaiting_assessment:
+            return
+        self.awaiting_assessment.discard(report_id)
+
+        if assessment.startswith(ASSESSMENT_ERROR_PREFIX):
+            assessment += "\n\nThe report stays queued and will be assessed again later."
+        QMessageBox.information(self, "Incident Assessment", assessment)
+
+    def closeEvent(self, event):
+        if self.assessment_worker and self.assessment_worker.isRunning():
+            self.assessment_rerun = False
+            self.assessment_worker.request_stop()
+            if not self.assessment_worker.wait(ASSESSMENT_SHUTDOWN_WAIT_MS):
+                # Stuck in a Gemini call; the report stays queued for next time.
+                self.assessment_worker.terminate()
+                self.assessment_worker.wait()
+        super().closeEvent(event)
 
     def clear_report_fields(self):
         self.concern_type.setCurrentIndex(0)
@@ -517,9 +442,17 @@ class CommunitySafetyApp(QMainWindow):
         layout.addWidget(desc_entry)
 
         date_calendar = QCalendarWidget()
+        date_calendar.currentPageChanged.connect(
+            lambda year, month: self.highlight_busy_days(date_calendar, year, month))
+        self.highlight_busy_days(date_calendar, date_calendar.yearShown(), date_calendar.monthShown())
         layout.addWidget(QLabel("Date:"))
         layout.addWidget(date_calendar)
 
+        recurrence_entry = QComboBox()
+        recurrence_entry.addItems(["Does not repeat", "Daily", "Weekly", "Monthly", "Yearly"])
+        layout.addWidget(QLabel("Repeats:"))
+        layout.addWidget(recurrence_entry)
+
         location_entry = QLineEdit()
         layout.addWidget(QLabel("Location:"))
         layout.addWidget(location_entry)
@@ -537,15 +470,13 @@ class CommunitySafetyApp(QMainWindow):
             date = date_calendar.selectedDate().toString("yyyy-MM-dd")
             location = location_entry.text().strip()
             organizer = organizer_entry.text().strip()
+            recurrence = recurrence_entry.currentText().upper() if recurrence_entry.currentIndex() else None
 
             if not title or not desc or not date or not location or not organizer:
                 QMessageBox.critical(add_window, "Error", "Please fill in all fields")
                 return
 
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO events (title, description, date, location, organizer) VALUES (?, ?, ?, ?, ?)",
-                           (title, desc, date, location, organizer))
-            self.conn.commit()
+            self.service.add_event(title, desc, date, location, organizer, recurrence)
 
             QMessageBox.information(add_window, "Success", "Event added successfully")
             self.refresh_events()
@@ -557,24 +488,31 @@ class CommunitySafetyApp(QMainWindow):
     def refresh_events(self):
         self.events_tree.clear()
 
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT title, date, location FROM events ORDER BY date")
-        for row in cursor.fetchall():
-            QTreeWidgetItem(self.events_tree, list(row))
+        for day, title, location, recurrence in self.service.upcoming_events():
+            QTreeWidgetItem(self.events_tree, [title, day.isoformat(), location, (recurrence or "").capitalize()])
+
+        self.highlight_busy_days(self.events_calendar, self.events_calendar.yearShown(),
+                                 self.events_calendar.monthShown())
+
+    def highlight_busy_days(self, calendar, year, month):
+        # Only the month on screen is queried; recurring events are expanded for that month alone.
+        calendar.setDateTextFormat(QDate(), QTextCharFormat())
+
+        busy_format = QTextCharFormat()
+        busy_format.setFontWeight(QFont.Bold)
+        busy_format.setBackground(QColor("#D6E9C6"))
+        for day in self.service.busy_days(year, month):
+            calendar.setDateTextFormat(QDate(day.year, day.month, day.day), busy_format)
 
     def submit_feedback(self):
         category = self.feedback_category.currentText()
         message = self.feedback_message.toPlainText().strip()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         if not category or not message:
             QMessageBox.critical(self, "Error", "Please fill in all fields")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO feedback (category, message, timestamp) VALUES (?, ?, ?)",
-                       (category, message, timestamp))
-        self.conn.commit()
+        self.service.add_feedback(category, message)
 
         QMessageBox.information(self, "Success", "Feedback submitted successfully")
         self.clear_feedback_fields()
@@ -587,16 +525,12 @@ class CommunitySafetyApp(QMainWindow):
         emergency_type = self.emergency_type.currentText()
         loc = self.sos_location.text().strip()
         contact = self.sos_contact.text().strip()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         if not emergency_type or not loc or not contact:
             QMessageBox.critical(self, "Error", "Please fill in all fields")
             return
 
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO sos (emergency_type, location, contact, timestamp) VALUES (?, ?, ?, ?)",
-                       (emergency_type, loc, contact, timestamp))
-        self.conn.commit()
+        self.service.add_sos(emergency_type, loc, contact)
 
         QMessageBox.warning(self, "SOS Activated", "Emergency services have been notified. Stay safe!")
         self.clear_sos_fields()
@@ -609,33 +543,13 @@ class CommunitySafetyApp(QMainWindow):
     def refresh_reports(self):
         self.reports_tree.clear()
 
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT type, location, status FROM reports ORDER BY timestamp DESC LIMIT 5")
-        for row in cursor.fetchall():
+        for row in self.service.recent_reports(5):
             QTreeWidgetItem(self.reports_tree, list(row))
 
     def generate_heatmap(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT location FROM reports")
-        locations = cursor.fetchall()
-
-        m = folium.Map(location=[0, 0], zoom_start=2)
-        heat_data = []
-        for loc in locations:
-            try:
-                lat_lon = loc[0].split(',')
-                if len(lat_lon) == 2:
-                    lat, lon = map(float, lat_lon)
-                    heat_data.append([lat, lon])
-                    folium.Marker(location=[lat, lon], popup=loc[0]).add_to(m)
-            except ValueError:
-                continue
-
-        HeatMap(heat_data).add_to(m)
-
         # Save to a temporary file
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.html')
-        m.save(temp_file.name)
+        self.service.build_heatmap(temp_file.name)
         
         # Load the temporary file in QWebEngineView
         self.heatmap_widget.load(QUrl.fromLocalFile(temp_file.name))
@@ -666,16 +580,12 @@ class CommunitySafetyApp(QMainWindow):
             title = title_entry.text().strip()
             content = content_entry.toPlainText().strip()
             author = author_entry.text().strip()
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             if not title or not content or not author:
                 QMessageBox.critical(dialog, "Error", "Please fill in all fields")
                 return
 
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO forum_posts (title, content, author, timestamp) VALUES (?, ?, ?, ?)",
-                           (title, content, author, timestamp))
-            self.conn.commit()
+            self.service.add_forum_post(title, content, author)
 
             QMessageBox.information(dialog, "Success", "Post submitted successfully")
             dialog.accept()
@@ -686,18 +596,14 @@ class CommunitySafetyApp(QMainWindow):
 
     def refresh_forum_posts(self):
         self.forum_posts.clear()
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT title, author, timestamp FROM forum_posts ORDER BY timestamp DESC")
-        for row in cursor.fetchall():
+        for row in self.service.list_forum_posts():
             self.forum_posts.addItem(f"{row[0]} - by {row[1]} on {row[2]}")
 
         self.forum_posts.itemClicked.connect(self.show_post_details)
 
     def show_post_details(self, item):
         title = item.text().split(' - ')[0]
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT content, author, timestamp FROM forum_posts WHERE title = ?", (title,))
-        post = cursor.fetchone()
+        post = self.service.get_forum_post(title)
 
         if post:
             content, author, timestamp = post
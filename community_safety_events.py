@@ -0,0 +1,86 @@
+"""Date handling and lazy recurrence expansion for community events.
+
+Event dates are stored as ISO "YYYY-MM-DD" text so they sort and range-scan
+correctly in SQLite. A recurring event is stored once with its rule and is
+only expanded into occurrences for the window being asked about.
+"""
+from datetime import date, timedelta
+
+RECURRENCE_RULES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+
+# Rule -> (days per step, months per step); exactly one is non-zero.
+RULE_STEPS = {
+    'DAILY': (1, 0),
+    'WEEKLY': (7, 0),
+    'MONTHLY': (0, 1),
+    'YEARLY': (0, 12),
+}
+
+
+def parse_date(value):
+    """Parse an ISO date string (a longer timestamp is truncated to its date)."""
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value.strip()[:10])
+
+
+def normalize_recurrence(recurrence):
+    """Return the canonical rule name, or None for a one-off event."""
+    if not recurrence:
+        return None
+    rule = recurrence.strip().upper()
+    if rule in ('', 'NONE'):
+        return None
+    if rule not in RULE_STEPS:
+        raise ValueError(f"Unknown recurrence rule {recurrence!r}; expected one of {', '.join(RECURRENCE_RULES)}")
+    return rule
+
+
+def month_bounds(year, month):
+    """First and last day of a calendar month."""
+    first = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return first, next_month - timedelta(days=1)
+
+
+def occurrences(start, recurrence, interval, until, window_start, window_end):
+    """Yield occurrence dates of an event that fall within [window_start, window_end].
+
+    Expansion jumps straight to the first step inside the window, so the cost
+    depends on the window size rather than on how long ago the series began.
+    Monthly and yearly series skip months that lack the start day (e.g. the
+    31st), as iCalendar does.
+    """
+    end = min(window_end, until) if until else window_end
+    if not recurrence:
+        if window_start <= start <= end:
+            yield start
+        return
+
+    interval = max(1, interval or 1)
+    step_days, step_months = RULE_STEPS[recurrence]
+
+    if step_days:
+        step = step_days * interval
+        steps = max(0, -(-(window_start - start).days // step))
+        current = start + timedelta(days=steps * step)
+        while current <= end:
+            yield current
+            current += timedelta(days=step)
+        return
+
+    step = step_months * interval
+    months_ahead = (window_start.year - start.year) * 12 + window_start.month - start.month
+    steps = max(0, months_ahead // step)
+    while True:
+        month_index = start.month - 1 + steps * step
+        year, month = start.year + month_index // 12, month_index % 12 + 1
+        if date(year, month, 1) > end:
+            return
+        steps += 1
+        try:
+            current = date(year, month, start.day)
+        except ValueError:
+            continue
+        if window_start <= current <= end:
+            yield current
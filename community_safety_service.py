@@ -0,0 +1,744 @@
+"""Headless service layer for the Community Safety app.
+
+Everything in here runs without a GUI: the Qt front end in
+CommunityAppSEF.py calls into CommunitySafetyService, and the command line
+entry point at the bottom of this module uses the same service for bulk
+ingestion and export jobs.
+"""
+import argparse
+import base64
+import csv
+import heapq
+import io
+import json
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from itertools import islice
+
+from community_safety_events import month_bounds, normalize_recurrence, occurrences, parse_date
+from community_safety_triage import (DEFAULT_MODEL_PATH, SEVERITY_LEVELS, TriageModel, benchmark, extract_severity,
+                                     is_holdout)
+
+# Constants for the API
+GEMINI_API_KEY = ''
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent'
+GEMINI_VISION_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent'
+# (connect, read) timeout in seconds for Gemini requests.
+GEMINI_TIMEOUT = (5, 30)
+
+DEFAULT_DB_PATH = 'community_safety.db'
+DEFAULT_CHUNK_SIZE = 10000
+
+# Columns accepted by bulk import/export, in table order (id excluded).
+TABLE_COLUMNS = {
+    'reports': ('type', 'description', 'location', 'timestamp', 'status', 'media_path', 'assessment',
+                'triage_severity', 'triage_category', 'triage_priority'),
+    'events': ('title', 'description', 'date', 'location', 'organizer',
+               'recurrence', 'recurrence_interval', 'recurrence_until'),
+    'feedback': ('category', 'message', 'timestamp'),
+    'sos': ('emergency_type', 'location', 'contact', 'timestamp'),
+    'forum_posts': ('title', 'content', 'author', 'timestamp'),
+}
+
+# Fields that must be non-empty, mirroring the "Please fill in all fields" checks in the UI.
+REQUIRED_COLUMNS = {
+    'reports': ('type', 'description', 'location'),
+    'events': ('title', 'description', 'date', 'location', 'organizer'),
+    'feedback': ('category', 'message'),
+    'sos': ('emergency_type', 'location', 'contact'),
+    'forum_posts': ('title', 'content', 'author'),
+}
+
+# Columns added after the original schema, created on existing databases by create_tables.
+ADDED_COLUMNS = {
+    'reports': (('triage_severity', 'TEXT'), ('triage_category', 'TEXT'), ('triage_priority', 'INTEGER'),
+                ('assessment_attempts', 'INTEGER NOT NULL DEFAULT 0'), ('last_attempt_at', 'TEXT')),
+    'events': (('recurrence', 'TEXT'), ('recurrence_interval', 'INTEGER'), ('recurrence_until', 'TEXT')),
+}
+
+# Bumped whenever create_tables needs a one-off data migration (stored in PRAGMA user_version).
+SCHEMA_VERSION = 1
+
+DEFAULT_UPCOMING_DAYS = 90
+
+ASSESSMENT_ERROR_PREFIX = "Error in getting assessment"
+
+# Tables with a free-text location column that can be exported as GeoJSON.
+GEO_TABLES = ('reports', 'events', 'sos')
+
+
+class ValidationError(ValueError):
+    """Raised when a record is missing one of its required fields."""
+
+
+def now_timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_lat_lon(location):
+    """Return (lat, lon) for a "lat,lon" location string, or None."""
+    if not location:
+        return None
+    lat_lon = location.split(',')
+    if len(lat_lon) != 2:
+        return None
+    try:
+        lat, lon = map(float, lat_lon)
+    except ValueError:
+        return None
+    return lat, lon
+
+
+def validate_record(table, record):
+    missing = [column for column in REQUIRED_COLUMNS[table] if not record.get(column)]
+    if missing:
+        raise ValidationError(f"Missing required fields for {table}: {', '.join(missing)}")
+
+
+def normalize_event(record):
+    """Canonicalize an event record's date and recurrence fields in place.
+
+    Raises ValidationError for unparseable dates or unknown recurrence rules.
+    """
+    try:
+        record['date'] = parse_date(record['date']).isoformat()
+        record['recurrence'] = normalize_recurrence(record.get('recurrence'))
+        if record['recurrence']:
+            record['recurrence_interval'] = max(1, int(record.get('recurrence_interval') or 1))
+            until = record.get('recurrence_until')
+            record['recurrence_until'] = parse_date(until).isoformat() if until else None
+        else:
+            record['recurrence_interval'] = record['recurrence_until'] = None
+    except (TypeError, ValueError) as e:
+        raise ValidationError(f"Invalid event dates or recurrence: {e}")
+
+
+def gemini_generate(parts, api_url=GEMINI_API_URL):
+    """Send content parts to Gemini and return (status_code, text or None)."""
+    import requests
+
+    headers = {
+        'Content-Type': 'application/json',
+    }
+    data = {
+        'contents': [{'parts': parts}],
+    }
+    params = {
+        'key': GEMINI_API_KEY,
+    }
+    response = requests.post(api_url, headers=headers, json=data, params=params, timeout=GEMINI_TIMEOUT)
+    if response.status_code == 200:
+        return response.status_code, response.json()['candidates'][0]['content']['parts'][0]['text']
+    return response.status_code, None
+
+
+class CommunitySafetyService:
+    def __init__(self, db_path=DEFAULT_DB_PATH, triage_model_path=DEFAULT_MODEL_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.triage_model = TriageModel.load(triage_model_path)
+        self.create_tables()
+
+    def close(self):
+        self.conn.close()
+
+    def create_tables(self):
+        cursor = self.conn.cursor()
+
+        # Drop the table if it exists (Optional: Only if you're okay with losing existing data)
+        # cursor.execute('DROP TABLE IF EXISTS reports')
+
+        # Recreate the table with the new schema
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY,
+                type TEXT,
+                description TEXT,
+                location TEXT,
+                timestamp TEXT,
+                status TEXT,
+                media_path TEXT,
+                assessment TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                description TEXT,
+                date TEXT,
+                location TEXT,
+                organizer TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY,
+                category TEXT,
+                message TEXT,
+                timestamp TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sos (
+                id INTEGER PRIMARY KEY,
+                emergency_type TEXT,
+                location TEXT,
+                contact TEXT,
+                timestamp TEXT
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forum_posts (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                content TEXT,
+                author TEXT,
+                timestamp TEXT
+            )
+        ''')
+
+        for table, added in ADDED_COLUMNS.items():
+            existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in added:
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+        # Remote-assessment queue: unassessed reports, fewest failed attempts first, then
+        # most urgent triage, so reports that keep failing fall behind fresh work.
+        cursor.execute('DROP INDEX IF EXISTS idx_reports_assessment_queue')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reports_assessment_retry_queue
+            ON reports (assessment_attempts, triage_priority DESC, id) WHERE assessment IS NULL
+        ''')
+
+        # Date-range indexes for events; one-off and recurring events are scanned separately.
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_events_single_date
+            ON events (date) WHERE recurrence IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_events_recurring_date
+            ON events (date) WHERE recurrence IS NOT NULL
+        ''')
+
+        # Reports still waiting for a local triage result (older rows, --no-triage imports).
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reports_untriaged
+            ON reports (id) WHERE triage_priority IS NULL
+        ''')
+
+        self.conn.commit()
+
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Older versions stored Gemini failures as the assessment text; clear them
+            # so those reports re-enter the assessment queue, and triage them.
+            with self.conn:
+                cursor.execute("UPDATE reports SET assessment = NULL WHERE assessment LIKE ?",
+                               (ASSESSMENT_ERROR_PREFIX + '%',))
+            self.backfill_triage()
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.commit()
+
+    # Reports
+
+    def triage_report(self, concern, desc):
+        return self.triage_model.triage(concern, desc)
+
+    def add_report(self, concern, desc, loc, media_path=None, assessment=None, status="Pending", timestamp=None):
+        """Store a report with its local triage result; returns (report_id, triage)."""
+        record = {'type': concern, 'description': desc, 'location': loc}
+        validate_record('reports', record)
+        triage = self.triage_report(concern, desc)
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO reports (type, description, location, timestamp, status, media_path, assessment, triage_severity, triage_category, triage_priority) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (concern, desc, loc, timestamp or now_timestamp(), status, media_path, assessment,
+                        triage.severity, triage.category, triage.priority))
+        self.conn.commit()
+        return cursor.lastrowid, triage
+
+    def backfill_triage(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Triage every report that has no triage result yet; returns the number updated."""
+        cursor = self.conn.cursor()
+        updated = 0
+        while True:
+            cursor.execute("SELECT id, type, description FROM reports WHERE triage_priority IS NULL ORDER BY id LIMIT ?",
+                           (chunk_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            updates = []
+            for report_id, concern, desc in rows:
+                triage = self.triage_report(concern, desc)
+                updates.append((triage.severity, triage.category, triage.priority, report_id))
+            with self.conn:
+                cursor.executemany("UPDATE reports SET triage_severity = ?, triage_category = ?, triage_priority = ? WHERE id = ?",
+                                   updates)
+            updated += len(updates)
+        return updated
+
+    def recent_reports(self, limit=5):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT type, location, status, COALESCE(triage_severity, '') FROM reports ORDER BY timestamp DESC LIMIT ?", (limit,))
+        return cursor.fetchall()
+
+    # Assessment
+
+    def get_incident_assessment(self, concern, desc, loc, media_path=None):
+        prompt = f"Analyze the following incident report:\nType: {concern}\nDescription: {desc}\nLocation: {loc}\n\nProvide a detailed assessment including:\n1. Severity level\n2. Potential risks\n3. Recommended actions\n4. Additional resources needed (if any)"
+
+        if media_path:
+            with open(media_path, "rb") as image_file:
+                image_data = base64.b64encode(image_file.read()).decode('utf-8')
+            parts = [
+                {'text': prompt},
+                {
+                    'inline_data': {
+                        'mime_type': 'image/jpeg',
+                        'data': image_data
+                    }
+                }
+            ]
+            status_code, assessment = gemini_generate(parts, GEMINI_VISION_API_URL)
+        else:
+            status_code, assessment = gemini_generate([{'text': prompt}])
+
+        if assessment is None:
+            assessment = f"{ASSESSMENT_ERROR_PREFIX}: Status Code {status_code}"
+
+        return assessment
+
+    def assess_report(self, report_id):
+        """Fetch the remote assessment for a stored report.
+
+        The assessment is only saved on success. A failure is counted in
+        assessment_attempts, which moves the report behind reports with fewer
+        failed attempts in the queue. Returns the assessment or error text.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT type, description, location, media_path FROM reports WHERE id = ?", (report_id,))
+        concern, desc, loc, media_path = cursor.fetchone()
+        try:
+            assessment = self.get_incident_assessment(concern, desc, loc, media_path)
+        except Exception as e:
+            assessment = f"{ASSESSMENT_ERROR_PREFIX}: {str(e)}"
+        if assessment.startswith(ASSESSMENT_ERROR_PREFIX):
+            cursor.execute("UPDATE reports SET assessment_attempts = assessment_attempts + 1, last_attempt_at = ? WHERE id = ?",
+                           (now_timestamp(), report_id))
+        else:
+            cursor.execute("UPDATE reports SET assessment = ?, last_attempt_at = ? WHERE id = ?",
+                           (assessment, now_timestamp(), report_id))
+        self.conn.commit()
+        return assessment
+
+    def assessment_queue(self, limit=10):
+        """Ids of reports still awaiting a remote assessment.
+
+        Reports with fewer failed attempts come first, then the most severe triage.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM reports WHERE assessment IS NULL "
+                       "ORDER BY assessment_attempts, triage_priority DESC, id LIMIT ?", (limit,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def process_assessment_queue(self, limit=10, on_assessed=None, should_stop=None):
+        """Assess up to limit queued reports; returns (assessed, failed)."""
+        return self.assess_reports(self.assessment_queue(limit), on_assessed, should_stop)
+
+    def assess_reports(self, report_ids, on_assessed=None, should_stop=None):
+        """Assess the given reports in order; returns (assessed, failed).
+
+        on_assessed, if given, is called with (report_id, assessment) after each
+        report. should_stop, if given, is checked before each report and ends
+        the run early when it returns true.
+        """
+        assessed = failed = 0
+        for report_id in report_ids:
+            if should_stop and should_stop():
+                break
+            assessment = self.assess_report(report_id)
+            if assessment.startswith(ASSESSMENT_ERROR_PREFIX):
+                failed += 1
+            else:
+                assessed += 1
+            if on_assessed:
+                on_assessed(report_id, assessment)
+        return assessed, failed
+
+    def triage_examples(self, holdout=0.0, evaluation=False):
+        """Yield (concern, desc, severity) from reports with a stored assessment.
+
+        With a holdout fraction, yields only the training split, or only the
+        evaluation split when evaluation is true.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, type, description, assessment FROM reports WHERE assessment IS NOT NULL AND assessment NOT LIKE ?",
+                       (ASSESSMENT_ERROR_PREFIX + '%',))
+        while True:
+            rows = cursor.fetchmany(DEFAULT_CHUNK_SIZE)
+            if not rows:
+                break
+            for report_id, concern, desc, assessment in rows:
+                if holdout and is_holdout(report_id, holdout) != evaluation:
+                    continue
+                yield concern, desc, extract_severity(assessment)
+
+    def train_triage(self, path=DEFAULT_MODEL_PATH, holdout=0.0):
+        self.triage_model = TriageModel.train(self.triage_examples(holdout))
+        self.triage_model.save(path)
+        return self.triage_model
+
+    def benchmark_triage(self, holdout=0.0):
+        return benchmark(self.triage_model, self.triage_examples(holdout, evaluation=bool(holdout)))
+
+    def ask_assistant(self, user_message):
+        try:
+            status_code, ai_response = gemini_generate([{'text': user_message}])
+            if ai_response is not None:
+                return ai_response
+            return f"Error - Status Code {status_code}"
+        except Exception as e:
+            return f"An error occurred: {str(e)}"
+
+    # Events
+
+    def add_event(self, title, desc, date, location, organizer, recurrence=None, interval=1, until=None):
+        record = {'title': title, 'description': desc, 'date': date, 'location': location,
+                  'organizer': organizer, 'recurrence': recurrence, 'recurrence_interval': interval,
+                  'recurrence_until': until}
+        validate_record('events', record)
+        normalize_event(record)
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO events (title, description, date, location, organizer, recurrence, recurrence_interval, recurrence_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       tuple(record[column] for column in TABLE_COLUMNS['events']))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def events_between(self, start, end):
+        """Yield (date, title, location, recurrence) for occurrences in [start, end], in date order.
+
+        Only events whose stored range can overlap the window are read, and
+        recurring events are expanded lazily for this window alone.
+        """
+        start, end = parse_date(start), parse_date(end)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT date, title, location FROM events WHERE recurrence IS NULL AND date BETWEEN ? AND ? ORDER BY date",
+                       (start.isoformat(), end.isoformat()))
+        single = ((parse_date(day), title, location, None) for day, title, location in cursor.fetchall())
+
+        cursor.execute("SELECT date, title, location, recurrence, recurrence_interval, recurrence_until FROM events "
+                       "WHERE recurrence IS NOT NULL AND date <= ? AND (recurrence_until IS NULL OR recurrence_until >= ?)",
+                       (end.isoformat(), start.isoformat()))
+        series = [self._event_series(row, start, end) for row in cursor.fetchall()]
+        return heapq.merge(single, *series, key=lambda occurrence: occurrence[0])
+
+    @staticmethod
+    def _event_series(row, start, end):
+        first, title, location, recurrence, interval, until = row
+        for day in occurrences(parse_date(first), recurrence, interval,
+                               parse_date(until) if until else None, start, end):
+            yield day, title, location, recurrence
+
+    def upcoming_events(self, days=DEFAULT_UPCOMING_DAYS, today=None):
+        today = parse_date(today) if today else datetime.now().date()
+        return self.events_between(today, today + timedelta(days=days))
+
+    def busy_days(self, year, month):
+        """Dates in the given month that have at least one event occurrence."""
+        return {day for day, _, _, _ in self.events_between(*month_bounds(year, month))}
+
+    # Feedback
+
+    def add_feedback(self, category, message):
+        validate_record('feedback', {'category': category, 'message': message})
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO feedback (category, message, timestamp) VALUES (?, ?, ?)",
+                       (category, message, now_timestamp()))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    # SOS
+
+    def add_sos(self, emergency_type, loc, contact):
+        validate_record('sos', {'emergency_type': emergency_type, 'location': loc, 'contact': contact})
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO sos (emergency_type, location, contact, timestamp) VALUES (?, ?, ?, ?)",
+                       (emergency_type, loc, contact, now_timestamp()))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    # Forum
+
+    def add_forum_post(self, title, content, author):
+        validate_record('forum_posts', {'title': title, 'content': content, 'author': author})
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO forum_posts (title, content, author, timestamp) VALUES (?, ?, ?, ?)",
+                       (title, content, author, now_timestamp()))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def list_forum_posts(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT title, author, timestamp FROM forum_posts ORDER BY timestamp DESC")
+        return cursor.fetchall()
+
+    def get_forum_post(self, title):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT content, author, timestamp FROM forum_posts WHERE title = ?", (title,))
+        return cursor.fetchone()
+
+    # Geo
+
+    def iter_report_coordinates(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield (lat, lon, location) for every report with a parseable location."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT location FROM reports")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for (location,) in rows:
+                lat_lon = parse_lat_lon(location)
+                if lat_lon:
+                    yield lat_lon[0], lat_lon[1], location
+
+    def build_heatmap(self, path):
+        """Render the incident heatmap to an HTML file at path."""
+        # Imported here, like requests in gemini_generate, so headless jobs such as
+        # bulk import/export don't need the map or HTTP dependencies installed.
+        import folium
+        from folium.plugins import HeatMap
+
+        m = folium.Map(location=[0, 0], zoom_start=2)
+        heat_data = []
+        for lat, lon, location in self.iter_report_coordinates():
+            heat_data.append([lat, lon])
+            folium.Marker(location=[lat, lon], popup=location).add_to(m)
+
+        HeatMap(heat_data).add_to(m)
+        m.save(path)
+        return path
+
+    # Bulk import/export
+
+    def bulk_import(self, table, records, chunk_size=DEFAULT_CHUNK_SIZE, triage=True):
+        """Insert an iterable of dict records in chunked transactions.
+
+        Records failing validation are skipped. Returns (inserted, skipped).
+        Reports are triaged as they are inserted unless triage is false, in
+        which case backfill_triage can fill them in later.
+        """
+        columns = TABLE_COLUMNS[table]
+        required = REQUIRED_COLUMNS[table]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        defaults = {'timestamp': now_timestamp()}
+        if table == 'reports':
+            defaults['status'] = "Pending"
+        counts = {'inserted': 0, 'skipped': 0}
+
+        def rows():
+            for record in records:
+                if not isinstance(record, dict) or not all(record.get(column) for column in required):
+                    counts['skipped'] += 1
+                    continue
+                if table == 'events':
+                    try:
+                        normalize_event(record)
+                    except ValidationError:
+                        counts['skipped'] += 1
+                        continue
+                if table == 'reports':
+                    assessment = record.get('assessment')
+                    if isinstance(assessment, str) and assessment.startswith(ASSESSMENT_ERROR_PREFIX):
+                        record['assessment'] = None
+                    severity = record.get('triage_severity')
+                    if severity not in (None, ''):
+                        severity = str(severity).capitalize()
+                        if severity not in SEVERITY_LEVELS:
+                            counts['skipped'] += 1
+                            continue
+                        record['triage_severity'] = severity
+                        record['triage_priority'] = SEVERITY_LEVELS.index(severity)
+                    elif triage:
+                        result = self.triage_report(record['type'], record['description'])
+                        record['triage_severity'] = result.severity
+                        record['triage_category'] = result.category
+                        record['triage_priority'] = result.priority
+                yield tuple(defaults.get(column) if record.get(column) in (None, '') else record[column]
+                            for column in columns)
+
+        row_iter = rows()
+        cursor = self.conn.cursor()
+        while True:
+            chunk = list(islice(row_iter, chunk_size))
+            if not chunk:
+                break
+            with self.conn:
+                cursor.executemany(sql, chunk)
+            counts['inserted'] += len(chunk)
+        return counts['inserted'], counts['skipped']
+
+    def iter_rows(self, table, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield rows of table (id first) without loading the whole table."""
+        columns = ('id',) + TABLE_COLUMNS[table]
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+    def export_csv(self, table, out, chunk_size=DEFAULT_CHUNK_SIZE):
+        writer = csv.writer(out)
+        writer.writerow(('id',) + TABLE_COLUMNS[table])
+        count = 0
+        for row in self.iter_rows(table, chunk_size):
+            writer.writerow(row)
+            count += 1
+        return count
+
+    def export_geojson(self, table, out, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Write table as a GeoJSON FeatureCollection, one feature at a time.
+
+        Rows whose location is not a "lat,lon" pair get a null geometry.
+        """
+        if table not in GEO_TABLES:
+            raise ValueError(f"{table} has no location column to export as GeoJSON")
+        columns = ('id',) + TABLE_COLUMNS[table]
+        location_index = columns.index('location')
+        out.write('{"type": "FeatureCollection", "features": [\n')
+        count = 0
+        for row in self.iter_rows(table, chunk_size):
+            lat_lon = parse_lat_lon(row[location_index])
+            geometry = {'type': 'Point', 'coordinates': [lat_lon[1], lat_lon[0]]} if lat_lon else None
+            feature = {'type': 'Feature', 'geometry': geometry, 'properties': dict(zip(columns, row))}
+            if count:
+                out.write(',\n')
+            out.write(json.dumps(feature))
+            count += 1
+        out.write('\n]}\n')
+        return count
+
+
+def read_records(path, fmt):
+    """Stream dict records from a CSV or JSONL file (or stdin for '-').
+
+    A leading UTF-8 byte order mark, as written by Excel, is stripped. A JSONL
+    line that is not a JSON object is reported on stderr and yielded as None,
+    which bulk_import counts as skipped.
+    """
+    if path == '-':
+        handle = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        handle = open(path, newline='', encoding='utf-8-sig')
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line_number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping line {line_number} of {path}: invalid JSON ({e})", file=sys.stderr)
+                    yield None
+                    continue
+                if not isinstance(record, dict):
+                    print(f"Skipping line {line_number} of {path}: expected a JSON object", file=sys.stderr)
+                    yield None
+                    continue
+                yield record
+    finally:
+        if path == '-':
+            handle.detach()
+        else:
+            handle.close()
+
+
+def guess_format(path, choices):
+    for fmt in choices:
+        if path.lower().endswith('.' + fmt):
+            return fmt
+    raise SystemExit(f"Cannot infer format from {path!r}; pass --format ({'/'.join(choices)})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Community Safety bulk import/export and triage jobs")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database path")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="Bulk load CSV/JSONL records into a table")
+    import_parser.add_argument('table', choices=sorted(TABLE_COLUMNS))
+    import_parser.add_argument('path', help="Input file, or '-' for stdin")
+    import_parser.add_argument('--format', choices=('csv', 'jsonl'))
+    import_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    import_parser.add_argument('--no-triage', action='store_true',
+                               help="Skip local triage of imported reports (run backfill-triage afterwards)")
+
+    export_parser = subparsers.add_parser('export', help="Stream a table out as CSV or GeoJSON")
+    export_parser.add_argument('table', choices=sorted(TABLE_COLUMNS))
+    export_parser.add_argument('path', help="Output file, or '-' for stdout")
+    export_parser.add_argument('--format', choices=('csv', 'geojson'))
+    export_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    train_parser = subparsers.add_parser('train-triage', help="Train the local triage model from assessed reports")
+    train_parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    train_parser.add_argument('--holdout', type=float, default=0.0,
+                              help="Fraction of assessed reports to leave out for bench-triage")
+
+    bench_parser = subparsers.add_parser('bench-triage', help="Measure triage latency and agreement with stored assessments")
+    bench_parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    bench_parser.add_argument('--holdout', type=float, default=0.0,
+                              help="Evaluate only the held-out split used by train-triage")
+
+    subparsers.add_parser('backfill-triage', help="Triage reports that have no triage result yet")
+
+    queue_parser = subparsers.add_parser('assess-queue', help="Fetch remote assessments for queued reports, most severe first")
+    queue_parser.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    service = CommunitySafetyService(args.db, getattr(args, 'model', DEFAULT_MODEL_PATH))
+    try:
+        if args.command == 'import':
+            fmt = args.format or guess_format(args.path, ('csv', 'jsonl'))
+            inserted, skipped = service.bulk_import(args.table, read_records(args.path, fmt), args.chunk_size,
+                                                    triage=not args.no_triage)
+            print(f"Imported {inserted} rows into {args.table} ({skipped} skipped)", file=sys.stderr)
+        elif args.command == 'backfill-triage':
+            print(f"Triaged {service.backfill_triage()} reports", file=sys.stderr)
+        elif args.command == 'train-triage':
+            service.train_triage(args.model, args.holdout)
+            print(f"Saved triage model to {args.model}", file=sys.stderr)
+        elif args.command == 'bench-triage':
+            results = service.benchmark_triage(args.holdout)
+            for key, value in results.items():
+                print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+        elif args.command == 'assess-queue':
+            assessed, failed = service.process_assessment_queue(args.limit)
+            print(f"Assessed {assessed} reports ({failed} failed)", file=sys.stderr)
+        else:
+            fmt = args.format or guess_format(args.path, ('csv', 'geojson'))
+            export = service.export_csv if fmt == 'csv' else service.export_geojson
+            if args.path == '-':
+                count = export(args.table, sys.stdout, args.chunk_size)
+            else:
+                with open(args.path, 'w', newline='', encoding='utf-8') as out:
+                    count = export(args.table, out, args.chunk_size)
+            print(f"Exported {count} rows from {args.table}", file=sys.stderr)
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""On-device triage for incident reports.
+
+A fast first pass that gives every report a severity level and category in
+well under a millisecond, before (or instead of) the remote Gemini
+assessment. With no trained model it falls back to keyword rules; a
+multinomial naive Bayes model can be trained offline from historical
+reports and their stored assessments.
+"""
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, namedtuple
+
+DEFAULT_MODEL_PATH = 'triage_model.json'
+
+# Ordered from least to most urgent; the index is the queue priority.
+SEVERITY_LEVELS = ('Low', 'Medium', 'High', 'Critical')
+
+CATEGORIES = ('Suspicious Activity', 'Community Issue', 'Infrastructure Problem', 'Other')
+
+SEVERITY_KEYWORDS = {
+    'Critical': ('weapon', 'gun', 'guns', 'knife', 'shooting', 'shot', 'stabbing', 'stabbed', 'fire', 'explosion',
+                 'bleeding', 'unconscious', 'hostage', 'kidnapping', 'overdose', 'collapsed'),
+    'High': ('assault', 'attack', 'attacked', 'fight', 'violence', 'violent', 'threat', 'threatening', 'robbery',
+             'burglary', 'break', 'breaking', 'theft', 'stolen', 'injured', 'injury', 'drugs', 'gas', 'leak',
+             'flood', 'flooding', 'harassment', 'crash'),
+    'Medium': ('suspicious', 'vandalism', 'graffiti', 'trespassing', 'loitering', 'broken', 'damaged', 'outage',
+               'speeding', 'noise', 'drunk', 'aggressive'),
+}
+
+CATEGORY_KEYWORDS = {
+    'Suspicious Activity': ('suspicious', 'stranger', 'strangers', 'loitering', 'lurking', 'prowler', 'prowling',
+                            'casing', 'trespassing', 'trespasser'),
+    'Infrastructure Problem': ('streetlight', 'streetlights', 'pothole', 'potholes', 'sidewalk', 'bridge', 'pipe',
+                               'outage', 'drain', 'sewer', 'sinkhole', 'powerline'),
+    'Community Issue': ('noise', 'litter', 'trash', 'garbage', 'graffiti', 'vandalism', 'parking', 'dog', 'dogs',
+                        'neighbor', 'neighbors', 'party'),
+}
+
+# Distinct keyword hits another category needs before it overrides the concern type the user picked.
+CATEGORY_OVERRIDE_HITS = 2
+# Posterior probability a trained category model needs before it overrides the user's concern type.
+CATEGORY_OVERRIDE_CONFIDENCE = 0.9
+
+ASSESSMENT_SEVERITY_RE = re.compile(
+    r'severity(?:\s+level)?\W{0,10}(critical|severe|high|moderate|medium|low|minor)', re.IGNORECASE)
+
+SEVERITY_ALIASES = {
+    'critical': 'Critical', 'severe': 'Critical', 'high': 'High',
+    'moderate': 'Medium', 'medium': 'Medium', 'low': 'Low', 'minor': 'Low',
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+TriageResult = namedtuple('TriageResult', ['severity', 'category', 'priority'])
+
+
+def tokenize(text):
+    if text is None:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def extract_severity(assessment):
+    """Pull the severity level out of a Gemini assessment, or None."""
+    if not assessment:
+        return None
+    match = ASSESSMENT_SEVERITY_RE.search(assessment)
+    if not match:
+        return None
+    return SEVERITY_ALIASES[match.group(1).lower()]
+
+
+def keyword_category(tokens, concern):
+    """Category from keywords, keeping the user's concern unless the keywords clearly disagree."""
+    chosen = concern if concern in CATEGORIES else 'Other'
+    token_set = set(tokens)
+    hits = {label: len(token_set.intersection(words)) for label, words in CATEGORY_KEYWORDS.items()}
+    best = max(hits, key=hits.get)
+    needed = 1 if chosen == 'Other' else CATEGORY_OVERRIDE_HITS
+    if hits[best] >= needed and hits[best] > hits.get(chosen, 0):
+        return best
+    return chosen
+
+
+def model_category(classifier, tokens, concern):
+    """Category from a trained model, with the same rule as keyword_category.
+
+    The user's concern is kept unless the model picks another category with
+    at least CATEGORY_OVERRIDE_CONFIDENCE probability.
+    """
+    chosen = concern if concern in CATEGORIES else 'Other'
+    predicted, confidence = classifier.predict_with_confidence(tokens)
+    if chosen == 'Other' or (predicted != chosen and confidence >= CATEGORY_OVERRIDE_CONFIDENCE):
+        return predicted
+    return chosen
+
+
+def keyword_label(tokens, keywords, default):
+    """Return the first label in keywords (in priority order) whose words appear in tokens."""
+    token_set = set(tokens)
+    for label, words in keywords.items():
+        if not token_set.isdisjoint(words):
+            return label
+    return default
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over bag-of-words tokens with Laplace smoothing.
+
+    Weights are stored per token as the log-likelihood gain over an unseen
+    token for each label, so prediction is one dict lookup per token.
+    """
+
+    def __init__(self, labels, base, unknown, weights):
+        self.labels = labels
+        self.base = base
+        self.unknown = unknown
+        self.weights = weights
+
+    @classmethod
+    def fit(cls, token_lists, labels, alpha=1.0):
+        label_counts = Counter(labels)
+        token_counts = {label: Counter() for label in label_counts}
+        vocabulary = set()
+        for tokens, label in zip(token_lists, labels):
+            token_counts[label].update(tokens)
+            vocabulary.update(tokens)
+
+        ordered = sorted(label_counts)
+        total = sum(label_counts.values())
+        base, unknown, denominators = [], [], []
+        for label in ordered:
+            denominator = sum(token_counts[label].values()) + alpha * (len(vocabulary) + 1)
+            denominators.append(denominator)
+            base.append(math.log(label_counts[label] / total))
+            unknown.append(math.log(alpha / denominator))
+        weights = {
+            token: [math.log((token_counts[label][token] + alpha) / denominator) - unseen
+                    for label, denominator, unseen in zip(ordered, denominators, unknown)]
+            for token in vocabulary
+        }
+        return cls(ordered, base, unknown, weights)
+
+    def scores(self, tokens):
+        """Unnormalized log posterior for each label, in self.labels order."""
+        n = len(tokens)
+        scores = [b + n * u for b, u in zip(self.base, self.unknown)]
+        weights = self.weights
+        for token in tokens:
+            gains = weights.get(token)
+            if gains:
+                scores = [score + gain for score, gain in zip(scores, gains)]
+        return scores
+
+    def predict(self, tokens):
+        scores = self.scores(tokens)
+        return self.labels[scores.index(max(scores))]
+
+    def predict_with_confidence(self, tokens):
+        """Return (label, posterior probability of that label)."""
+        scores = self.scores(tokens)
+        best = max(scores)
+        total = sum(math.exp(score - best) for score in scores)
+        return self.labels[scores.index(best)], 1 / total
+
+    def to_dict(self):
+        return {'labels': self.labels, 'base': self.base, 'unknown': self.unknown, 'weights': self.weights}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['labels'], data['base'], data['unknown'], data['weights'])
+
+
+class TriageModel:
+    """Severity and category classifiers; either falls back to keywords when untrained."""
+
+    def __init__(self, severity=None, category=None):
+        self.severity = severity
+        self.category = category
+
+    def triage(self, concern, desc):
+        desc_tokens = tokenize(desc)
+        severity_tokens = tokenize(concern) + desc_tokens
+
+        if self.severity:
+            severity = self.severity.predict(severity_tokens)
+        else:
+            severity = keyword_label(severity_tokens, SEVERITY_KEYWORDS, 'Low')
+
+        if self.category:
+            category = model_category(self.category, desc_tokens, concern)
+        else:
+            category = keyword_category(desc_tokens, concern)
+
+        return TriageResult(severity, category, SEVERITY_LEVELS.index(severity))
+
+    @classmethod
+    def train(cls, examples):
+        """Train from (concern, desc, severity) tuples; severity may be None if unknown."""
+        severity_tokens, severity_labels = [], []
+        category_tokens, category_labels = [], []
+        for concern, desc, severity in examples:
+            desc_tokens = tokenize(desc)
+            if severity:
+                severity_tokens.append(tokenize(concern) + desc_tokens)
+                severity_labels.append(severity)
+            if concern:
+                category_tokens.append(desc_tokens)
+                category_labels.append(concern)
+        severity = NaiveBayesClassifier.fit(severity_tokens, severity_labels) if severity_labels else None
+        category = NaiveBayesClassifier.fit(category_tokens, category_labels) if category_labels else None
+        return cls(severity, category)
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        data = {
+            'severity': self.severity.to_dict() if self.severity else None,
+            'category': self.category.to_dict() if self.category else None,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        """Load a trained model, or return the keyword fallback if path does not exist."""
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(
+            NaiveBayesClassifier.from_dict(data['severity']) if data.get('severity') else None,
+            NaiveBayesClassifier.from_dict(data['category']) if data.get('category') else None,
+        )
+
+
+def is_holdout(report_id, holdout):
+    """Deterministically assign roughly a `holdout` fraction of report ids to the evaluation split."""
+    return holdout > 0 and (report_id * 2654435761) % 1000 < holdout * 1000
+
+
+def benchmark(model, examples):
+    """Time model.triage over (concern, desc, severity) examples and measure agreement.
+
+    Severity agreement is against the severity extracted from the stored
+    assessment; category agreement is against the reported concern type.
+    """
+    latencies = []
+    severity_total = severity_agree = 0
+    category_total = category_agree = 0
+    for concern, desc, severity in examples:
+        start = time.perf_counter()
+        result = model.triage(concern, desc)
+        latencies.append(time.perf_counter() - start)
+        if severity:
+            severity_total += 1
+            severity_agree += result.severity == severity
+        if concern:
+            category_total += 1
+            category_agree += result.category == concern
+
+    if not latencies:
+        return {'count': 0}
+    latencies.sort()
+    return {
+        'count': len(latencies),
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'p95_ms': 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'severity_agreement': severity_agree / severity_total if severity_total else None,
+        'severity_count': severity_total,
+        'category_agreement': category_agree / category_total if category_total else None,
+        'category_count': category_total,
+    }
@@ -0,0 +1,237 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from community_safety_events import occurrences
+from community_safety_service import CommunitySafetyService, read_records
+from community_safety_triage import NaiveBayesClassifier, TriageModel, extract_severity, tokenize
+
+
+@pytest.fixture
+def service():
+    service = CommunitySafetyService(':memory:', None)
+    yield service
+    service.close()
+
+
+def report(description='Streetlight out', location='40.7,-74.0', **extra):
+    return dict({'type': 'Community Issue', 'description': description, 'location': location}, **extra)
+
+
+def test_bulk_import_skips_records_missing_required_fields(service):
+    records = [report(), report(description=''), {'type': 'Other'}, report(location='Main St')]
+
+    assert service.bulk_import('reports', records, chunk_size=2) == (2, 2)
+    assert service.conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0] == 2
+
+
+def test_bulk_import_commits_every_chunk(service):
+    records = [report(description=f"report {i}") for i in range(7)]
+
+    assert service.bulk_import('reports', records, chunk_size=3) == (7, 0)
+    assert [row[2] for row in service.iter_rows('reports', chunk_size=2)] == [f"report {i}" for i in range(7)]
+
+
+def test_read_records_strips_utf8_bom(tmp_path, service):
+    path = tmp_path / 'reports.csv'
+    path.write_bytes('\ufefftype,description,location\nOther,Loose dog,"1,2"\n'.encode('utf-8'))
+
+    assert service.bulk_import('reports', read_records(str(path), 'csv')) == (1, 0)
+
+
+def test_read_records_skips_malformed_jsonl_lines(tmp_path, service, capsys):
+    path = tmp_path / 'reports.jsonl'
+    path.write_text(json.dumps(report()) + '\n{"type": \n["not", "a", "record"]\n' + json.dumps(report()) + '\n')
+
+    assert service.bulk_import('reports', read_records(str(path), 'jsonl'), chunk_size=1) == (2, 2)
+    errors = capsys.readouterr().err
+    assert 'line 2' in errors and 'line 3' in errors
+
+
+def test_export_csv_round_trips(service):
+    service.bulk_import('reports', [report(), report(description='Pothole')])
+    out = io.StringIO()
+
+    assert service.export_csv('reports', out, chunk_size=1) == 2
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [row['description'] for row in rows] == ['Streetlight out', 'Pothole']
+    assert rows[0]['status'] == 'Pending'
+
+
+def test_export_geojson_is_valid_feature_collection(service):
+    service.bulk_import('reports', [report(), report(location='Main St'), report(location='1.5,2.5')])
+    out = io.StringIO()
+
+    assert service.export_geojson('reports', out, chunk_size=2) == 3
+    collection = json.loads(out.getvalue())
+    assert collection['type'] == 'FeatureCollection'
+    geometries = [feature['geometry'] for feature in collection['features']]
+    assert geometries == [
+        {'type': 'Point', 'coordinates': [-74.0, 40.7]},
+        None,
+        {'type': 'Point', 'coordinates': [2.5, 1.5]},
+    ]
+
+
+def test_export_geojson_rejects_tables_without_location(service):
+    with pytest.raises(ValueError):
+        service.export_geojson('feedback', io.StringIO())
+
+
+def test_bulk_import_handles_non_string_description_and_imported_severity(service):
+    records = [
+        report(description=123),
+        report(triage_severity='high'),
+        report(triage_severity='urgent'),
+    ]
+
+    assert service.bulk_import('reports', records) == (2, 1)
+    rows = service.conn.execute("SELECT triage_severity, triage_priority FROM reports ORDER BY id").fetchall()
+    assert rows[1] == ('High', 2)
+
+
+def test_bulk_import_without_triage_can_be_backfilled(service):
+    service.bulk_import('reports', [report(description='Man with a knife')], triage=False)
+    assert service.conn.execute("SELECT triage_priority FROM reports").fetchone() == (None,)
+
+    assert service.backfill_triage() == 1
+    assert service.conn.execute("SELECT triage_severity FROM reports").fetchone() == ('Critical',)
+
+
+def test_assessment_queue_orders_by_triage_severity(service):
+    low, _ = service.add_report('Community Issue', 'Litter in the park', '1,2')
+    critical, _ = service.add_report('Other', 'Someone is waving a gun', '1,2')
+    assessed, _ = service.add_report('Other', 'Fire in a building', '1,2', assessment='Severity level: Critical')
+    high, _ = service.add_report('Other', 'Burglary next door', '1,2')
+
+    assert service.assessment_queue() == [critical, high, low]
+
+
+def test_failed_assessments_fall_behind_fresh_reports(service, monkeypatch):
+    monkeypatch.setattr('community_safety_service.gemini_generate', lambda parts, api_url=None: (400, None))
+    guns = [service.add_report('Other', 'Someone is waving a gun', '1,2')[0] for _ in range(3)]
+    litter, _ = service.add_report('Community Issue', 'Litter in the park', '1,2')
+
+    assert service.process_assessment_queue(limit=3) == (0, 3)
+    assert service.assessment_queue() == [litter] + guns
+    assert service.conn.execute("SELECT assessment_attempts FROM reports WHERE id = ?", (guns[0],)).fetchone() == (1,)
+
+
+def test_assess_reports_handles_explicit_ids_before_the_queue(service, monkeypatch):
+    monkeypatch.setattr('community_safety_service.gemini_generate', lambda parts, api_url=None: (200, 'Severity: Low'))
+    gun, _ = service.add_report('Other', 'Someone is waving a gun', '1,2')
+    litter, _ = service.add_report('Community Issue', 'Litter in the park', '1,2')
+    seen = []
+
+    assert service.assess_reports([litter], lambda report_id, assessment: seen.append(report_id)) == (1, 0)
+    assert seen == [litter]
+    assert service.assessment_queue() == [gun]
+
+
+def test_migration_requeues_error_assessments_and_triages_old_reports(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE reports (id INTEGER PRIMARY KEY, type TEXT, description TEXT, location TEXT, "
+                 "timestamp TEXT, status TEXT, media_path TEXT, assessment TEXT)")
+    conn.execute("INSERT INTO reports (type, description, location, assessment) VALUES "
+                 "('Other', 'Man with a knife', '1,2', 'Error in getting assessment: Status Code 400')")
+    conn.commit()
+    conn.close()
+
+    service = CommunitySafetyService(path, None)
+    try:
+        assert service.assessment_queue() == [1]
+        assert service.recent_reports() == [('Other', '1,2', None, 'Critical')]
+        assert list(service.triage_examples()) == []
+    finally:
+        service.close()
+
+
+def test_keyword_triage_keeps_user_category_unless_keywords_are_decisive():
+    model = TriageModel()
+
+    assert model.triage('Community Issue', 'A car parked under a broken light').category == 'Community Issue'
+    assert model.triage('Community Issue', 'Suspicious stranger loitering').category == 'Suspicious Activity'
+    assert model.triage('Other', 'Pothole on Main St').category == 'Infrastructure Problem'
+
+
+def test_trained_category_keeps_user_choice_unless_model_is_confident():
+    examples = [('Infrastructure Problem', 'pothole on the road', None)] * 20 + \
+               [('Community Issue', 'noisy party next door', None)] * 20 + \
+               [('Community Issue', 'car parked outside', None), ('Infrastructure Problem', 'car parked outside', None)]
+    model = TriageModel.train(examples)
+
+    assert model.triage('Community Issue', 'car parked outside').category == 'Community Issue'
+    assert model.triage('Infrastructure Problem', 'car parked outside').category == 'Infrastructure Problem'
+    assert model.triage('Community Issue', 'pothole pothole pothole').category == 'Infrastructure Problem'
+    assert model.triage('Other', 'noisy party').category == 'Community Issue'
+
+
+def test_naive_bayes_learns_and_round_trips():
+    tokens = [tokenize('knife attack'), tokenize('gun shots'), tokenize('litter bin'), tokenize('trash bags')]
+    labels = ['High', 'High', 'Low', 'Low']
+    classifier = NaiveBayesClassifier.from_dict(NaiveBayesClassifier.fit(tokens, labels).to_dict())
+
+    assert classifier.predict(tokenize('a knife')) == 'High'
+    assert classifier.predict(tokenize('more trash')) == 'Low'
+
+
+def test_extract_severity():
+    assert extract_severity('**1. Severity Level:** Moderate') == 'Medium'
+    assert extract_severity('Severity: HIGH - act now') == 'High'
+    assert extract_severity('No rating given') is None
+
+
+def test_occurrences_one_off_event():
+    start = date(2026, 10, 25)
+
+    assert list(occurrences(start, None, None, None, date(2026, 10, 1), date(2026, 10, 31))) == [start]
+    assert list(occurrences(start, None, None, None, date(2026, 11, 1), date(2026, 11, 30))) == []
+
+
+def test_occurrences_weekly_jumps_into_window():
+    window = list(occurrences(date(2020, 1, 7), 'WEEKLY', 2, None, date(2026, 10, 1), date(2026, 10, 31)))
+
+    assert window == [date(2026, 10, 6), date(2026, 10, 20)]
+    assert all((day - date(2020, 1, 7)).days % 14 == 0 for day in window)
+
+
+def test_occurrences_monthly_skips_short_months_and_stops_at_until():
+    days = list(occurrences(date(2026, 1, 31), 'MONTHLY', 1, date(2026, 7, 15), date(2026, 1, 1), date(2026, 12, 31)))
+
+    assert days == [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)]
+
+
+def test_occurrences_yearly_leap_day():
+    days = list(occurrences(date(2024, 2, 29), 'YEARLY', 1, None, date(2025, 1, 1), date(2032, 12, 31)))
+
+    assert days == [date(2028, 2, 29), date(2032, 2, 29)]
+
+
+def test_events_between_merges_series_in_date_order(service):
+    service.add_event('Watch', 'Weekly watch', '2026-10-06', 'Hall', 'Ann', 'weekly')
+    service.add_event('Picnic', 'One off', '2026-10-15', 'Park', 'Bob')
+    service.add_event('Old', 'Long gone', '2019-10-15', 'Park', 'Bob')
+
+    assert [(day.isoformat(), title) for day, title, _, _ in service.events_between('2026-10-10', '2026-10-21')] == [
+        ('2026-10-13', 'Watch'), ('2026-10-15', 'Picnic'), ('2026-10-20', 'Watch'),
+    ]
+    assert service.busy_days(2026, 9) == set()
+
+
+def test_bulk_import_events_skips_invalid_dates_and_rules(service):
+    event = {'title': 'Meet', 'description': 'Monthly meeting', 'location': 'Hall', 'organizer': 'Ann'}
+    records = [
+        dict(event, date='2026-11-02 18:00', recurrence='monthly'),
+        dict(event, date='not a date'),
+        dict(event, date='2026-11-02', recurrence='fortnightly'),
+    ]
+
+    assert service.bulk_import('events', records) == (1, 2)
+    assert service.conn.execute("SELECT date, recurrence, recurrence_interval FROM events").fetchall() == [
+        ('2026-11-02', 'MONTHLY', 1),
+    ]